@@ -82,6 +82,23 @@ def parse_filter(grid_filter: str) -> FilterAST:
         return FilterAST(hs_filter.parseString(grid_filter, parseAll=True)[0])
 
 
+# Maximum number of parsed filters, shared by the providers
+_PARSE_FILTER_CACHE_LRU_SIZE = 1024
+
+
+@lru_cache(maxsize=_PARSE_FILTER_CACHE_LRU_SIZE)
+def _cached_parse_filter(grid_filter: str) -> FilterAST:
+    """Return the AST tree of filter, shared between the calls.
+    The AST must not be modified.
+
+    Args:
+        grid_filter: A filter request
+    Returns:
+        A `FilterAST`
+    """
+    return parse_filter(grid_filter)
+
+
 # --- Generate python to apply filter
 # Maximum number of generated python function
 _FILTER_CACHE_LRU_SIZE = 500
@@ -15,7 +15,7 @@ from __future__ import unicode_literals
 import datetime
 import functools
 import json
-from typing import Dict, Optional, Tuple, List, Any, Union
+from typing import Dict, Optional, Tuple, List, Any, Union, Callable
 
 from .datatypes import Quantity, Coordinate, Ref, Bin, Uri, \
     MARKER, NA, REMOVE, XStr
@@ -25,7 +25,39 @@ from .metadata import MetadataObject
 from .sortabledict import SortableDict
 from .type import Entity
 from .version import LATEST_VER, VER_3_0, Version
-from .zoneinfo import timezone_name
+from .zoneinfo import timezone_name, timezone
+
+# Prefixes of the Haystack JSON values
+_STR_PREFIX = 's:'
+_URI_PREFIX = 'u:'
+_BIN_PREFIX = 'b:'
+_XSTR_PREFIX = 'x:'
+_NUM_PREFIX = 'n:'
+_COORD_PREFIX = 'c:'
+_REF_PREFIX = 'r:'
+_DATE_PREFIX = 'd:'
+_TIME_PREFIX = 'h:'
+_DATE_TIME_PREFIX = 't:'
+_DECIMAL_FORMAT = _NUM_PREFIX + '%f'
+
+_SUBCLASS_CACHE_SIZE = 256
+
+# Haystack timezone name of each tzinfo already dumped
+_TZ_CACHE: Dict[Any, str] = {}
+_ZERO_OFFSET = datetime.timedelta(0)
+
+# The JSON tree is built by this module and can not be circular.
+_JSON_ENCODER = json.JSONEncoder(check_circular=False)
+
+try:
+    # noinspection PyUnresolvedReferences
+    import orjson
+
+    def _dumps(obj: Any) -> str:
+        # The column names and metadata keys can be sub-classes of str
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS).decode('utf-8')
+except ImportError:
+    _dumps = _JSON_ENCODER.encode  # type: ignore
 
 
 def dump_grid(grid: Grid) -> str:
@@ -36,7 +68,7 @@ def dump_grid(grid: Grid) -> str:
     Returns:
         A json string
     """
-    return json.dumps(_dump_grid_to_json(grid))
+    return _dumps(_dump_grid_to_json(grid))
 
 
 def _dump_grid_to_json(grid: Grid) -> Dict[str, Union[List[str], Dict[str, str]]]:
@@ -57,30 +89,22 @@ def _dump_grid_to_json(grid: Grid) -> Dict[str, Union[List[str], Dict[str, str]]
 def _dump_meta(meta: MetadataObject,
                version: Version = LATEST_VER,
                for_grid: Optional[bool] = False) -> Dict[str, str]:
-    _dump = functools.partial(_dump_meta_item, version=version)
-    _meta = dict(map(_dump, list(meta.items())))
+    if not meta:
+        return {'ver': str(version)} if for_grid else {}
+    _meta = {_dump_id(item_id): _dump_scalar(item_value, version) for item_id, item_value in meta.items()}
     if for_grid:
         _meta['ver'] = str(version)
     return _meta  # type: ignore
 
 
-def _dump_meta_item(item: str, version: Version = LATEST_VER) \
-        -> Tuple[str, Union[None, bool, str, List[str], Entity]]:
-    (item_id, item_value) = item  # type: ignore
-    return (_dump_id(item_id),  # type: ignore
-            _dump_scalar(item_value, version=version))  # type: ignore
-
-
 def _dump_columns(cols: SortableDict, version: Version = LATEST_VER) -> List[str]:
-    _dump = functools.partial(_dump_column, version=version)
-    _cols = list(zip(*list(cols.items())))
-    if not _cols:
+    if not cols:
         raise ValueError("Empty columns is not valide. Use `grid.extends_columns()`")
-    return list(map(_dump, *_cols))  # type: ignore
+    return [_dump_column(col, col_meta, version) for col, col_meta in cols.items()]  # type: ignore
 
 
 def _dump_column(col: str, col_meta: MetadataObject, version: Version = LATEST_VER) -> Dict[str, str]:
-    if bool(col_meta):
+    if col_meta:
         _meta = _dump_meta(col_meta, version=version)
     else:
         _meta = {}
@@ -89,13 +113,36 @@ def _dump_column(col: str, col_meta: MetadataObject, version: Version = LATEST_V
 
 
 def _dump_rows(grid: Grid) -> List[str]:
-    return list(map(functools.partial(_dump_row, grid), grid))  # type: ignore
+    # Dump column by column, to select the encoder once per column
+    rows = list(grid)
+    dumped_rows: List[Dict[str, Any]] = [{} for _ in rows]
+    for col in grid.column.keys():
+        present = [i for i, row in enumerate(rows) if col in row]
+        values = [rows[i][col] for i in present]
+        for i, value in zip(present, _dump_values(values, grid.version)):
+            dumped_rows[i][col] = value
+    return dumped_rows  # type: ignore
+
+
+def _dump_values(values: List[Any], version: Version) -> List[Any]:
+    types = {type(value) for value in values}
+    if len(types) == 1:
+        value_type = types.pop()
+        column_encoder = _COLUMN_ENCODERS.get(value_type)
+        if column_encoder:
+            return column_encoder(values)
+        encoder = _ENCODERS.get(value_type)
+        if encoder:
+            return list(map(encoder, values))
+    # Mixed or special values
+    return [_dump_scalar(value, version) for value in values]
 
 
 def _dump_row(grid: Grid, row: Entity) -> Dict[str, str]:
+    version = grid.version
     return {
-        c: _dump_scalar(row.get(c), version=grid.version)  # type: ignore
-        for c in list(grid.column.keys()) if c in row
+        c: _dump_scalar(row[c], version)  # type: ignore
+        for c in grid.column if c in row
     }
 
 
@@ -114,67 +161,63 @@ def _dump_scalar(scalar: Any, version: Version = LATEST_VER) \
         if version < VER_3_0:
             return REMOVE2_STR
         return REMOVE3_STR
-    if isinstance(scalar, list):
-        return _dump_list(scalar, version=version)
-    if isinstance(scalar, dict):
-        return _dump_dict(scalar, version=version)  # type: ignore
-    if isinstance(scalar, bool):
-        return _dump_bool(scalar)
-    if isinstance(scalar, Ref):
-        return _dump_ref(scalar)
-    if isinstance(scalar, Bin):
-        return _dump_bin(scalar)
-    if isinstance(scalar, XStr):
-        return _dump_xstr(scalar)
-    if isinstance(scalar, Uri):
-        return _dump_uri(scalar)
-    if isinstance(scalar, str):
-        return _dump_str(scalar)
-    if isinstance(scalar, datetime.datetime):
-        return _dump_date_time(scalar)
-    if isinstance(scalar, datetime.time):
-        return _dump_time(scalar)
-    if isinstance(scalar, datetime.date):
-        return _dump_date(scalar)
-    if isinstance(scalar, Coordinate):
-        return _dump_coord(scalar)
-    if isinstance(scalar, Quantity):
-        return _dump_quantity(scalar)
-    if isinstance(scalar, (float, int)):
-        return _dump_decimal(scalar)
-    if isinstance(scalar, Grid):
-        return _dump_grid_to_json(scalar)  # type: ignore
+    encoder = _VERSIONED_ENCODERS.get(type(scalar))
+    if encoder:
+        return encoder(scalar, version=version)
+    encoder = _ENCODERS.get(type(scalar))
+    if encoder:
+        return encoder(scalar)
+    subclass_encoder = _subclass_encoder(type(scalar))  # type: ignore
+    if subclass_encoder:
+        encoder, versioned = subclass_encoder
+        if versioned:
+            return encoder(scalar, version=version)
+        return encoder(scalar)
     raise NotImplementedError('Unhandled case: %r' % scalar)
 
 
+@functools.lru_cache(maxsize=_SUBCLASS_CACHE_SIZE)
+def _subclass_encoder(scalar_type: type) -> Optional[Tuple[Callable[..., Any], bool]]:
+    # Search the first compatible type. The encoder tables are never modified.
+    for base_type, encoder, versioned in _SUBCLASS_ENCODERS:
+        if issubclass(scalar_type, base_type):
+            return encoder, versioned
+    return None
+
+
 def _dump_id(id_str: str) -> str:
     return id_str
 
 
 def _dump_str(str_value: str) -> str:
-    return 's:%s' % str_value
+    return f'{_STR_PREFIX}{str_value}'
 
 
 def _dump_uri(uri_value: Uri) -> str:
-    return 'u:%s' % uri_value
+    return f'{_URI_PREFIX}{uri_value}'
 
 
 def _dump_bin(bin_value: Bin) -> str:
-    return 'b:%s' % bin_value
+    return f'{_BIN_PREFIX}{bin_value}'
 
 
 def _dump_xstr(xstr_value: XStr) -> str:
-    return 'x:%s:%s' % (xstr_value.encoding, xstr_value.data_to_string())
+    return f'{_XSTR_PREFIX}{xstr_value.encoding}:{xstr_value.data_to_string()}'
 
 
 def _dump_quantity(quantity: Quantity) -> str:
     if (quantity.units is None) or (quantity.units == ''):
         return _dump_decimal(quantity.m)
-    return 'n:%f %s' % (quantity.m, quantity.symbol)
+    return f'{_NUM_PREFIX}{quantity.m:f} {quantity.symbol}'
 
 
 def _dump_decimal(decimal: float) -> str:
-    return 'n:%f' % decimal
+    return f'{_NUM_PREFIX}{decimal:f}'
+
+
+def _dump_decimals(decimals: List[float]) -> List[str]:
+    # Same format as `_dump_decimal()`, without a Python call per value
+    return list(map(_DECIMAL_FORMAT.__mod__, decimals))
 
 
 def _dump_bool(bool_value: bool) -> bool:
@@ -182,33 +225,40 @@ def _dump_bool(bool_value: bool) -> bool:
 
 
 def _dump_coord(coordinate: Coordinate) -> str:
-    return 'c:%f,%f' % (coordinate.latitude, coordinate.longitude)
+    return f'{_COORD_PREFIX}{coordinate.latitude:f},{coordinate.longitude:f}'
 
 
 def _dump_ref(ref: Ref) -> str:
     if ref.has_value:
-        return 'r:%s %s' % (ref.name, ref.value)
-    return 'r:%s' % ref.name
+        return f'{_REF_PREFIX}{ref.name} {ref.value}'
+    return f'{_REF_PREFIX}{ref.name}'
 
 
 def _dump_date(date: datetime.date) -> str:
-    return 'd:%s' % date.isoformat()
+    return f'{_DATE_PREFIX}{date.isoformat()}'
 
 
 def _dump_time(time: datetime.time) -> str:
-    return 'h:%s' % time.isoformat()
+    return f'{_TIME_PREFIX}{time.isoformat()}'
 
 
 def _dump_date_time(date_time: datetime.datetime) -> str:
-    tz_name = timezone_name(date_time)
-    return 't:%s %s' % (date_time.isoformat(), tz_name)
+    tz_info = date_time.tzinfo
+    tz_name = _TZ_CACHE.get(tz_info)
+    if tz_name is None:
+        tz_name = timezone_name(date_time)
+        # Else, the name was found with the offset at this date, and can change with the date
+        if getattr(tz_info, 'zone', None) == timezone(tz_name).zone \
+                or tz_info.utcoffset(None) == _ZERO_OFFSET:  # type: ignore
+            _TZ_CACHE[tz_info] = tz_name
+    return f'{_DATE_TIME_PREFIX}{date_time.isoformat()} {tz_name}'
 
 
 def _dump_list(lst: List[Any], version: Version = LATEST_VER) -> List[str]:
     if version < VER_3_0:
         raise ValueError('Project Haystack %s '
                          'does not support lists' % version)
-    return list(map(functools.partial(_dump_scalar, version=version), lst))  # type: ignore
+    return [_dump_scalar(value, version) for value in lst]  # type: ignore
 
 
 def _dump_dict(dic: Dict[str, Any], version: Version = LATEST_VER) -> Dict[str, str]:
@@ -218,6 +268,41 @@ def _dump_dict(dic: Dict[str, Any], version: Version = LATEST_VER) -> Dict[str,
     return {k: _dump_scalar(v, version=version) for (k, v) in dic.items()}  # type: ignore
 
 
+# Encoders selected with `type(scalar)`. The order is used for sub-classes.
+_VERSIONED_ENCODERS: Dict[type, Callable[..., Any]] = {
+    list: _dump_list,
+    dict: _dump_dict,
+}
+
+_ENCODERS: Dict[type, Callable[[Any], Any]] = {
+    bool: _dump_bool,
+    Ref: _dump_ref,
+    Bin: _dump_bin,
+    XStr: _dump_xstr,
+    Uri: _dump_uri,
+    str: _dump_str,
+    datetime.datetime: _dump_date_time,
+    datetime.time: _dump_time,
+    datetime.date: _dump_date,
+    Coordinate: _dump_coord,
+    Quantity: _dump_quantity,
+    float: _dump_decimal,
+    int: _dump_decimal,
+    Grid: _dump_grid_to_json,
+}
+
+# Search order for the sub-classes, with a flag for the versioned encoders
+_SUBCLASS_ENCODERS: Tuple[Tuple[type, Callable[..., Any], bool], ...] = \
+    tuple((scalar_type, encoder, True) for scalar_type, encoder in _VERSIONED_ENCODERS.items()) + \
+    tuple((scalar_type, encoder, False) for scalar_type, encoder in _ENCODERS.items())
+
+# Encoders for a whole column of values with the same type
+_COLUMN_ENCODERS: Dict[type, Callable[[List[Any]], List[Any]]] = {
+    float: _dump_decimals,
+    int: _dump_decimals,
+}
+
+
 def dump_scalar(scalar: Any, version: Version = LATEST_VER) -> str:
     """
     Dump a scalar to JSON
@@ -227,4 +312,4 @@ def dump_scalar(scalar: Any, version: Version = LATEST_VER) -> str:
     Returns:
         The JSON string
     """
-    return json.dumps(_dump_scalar(scalar, version))
+    return _JSON_ENCODER.encode(_dump_scalar(scalar, version))
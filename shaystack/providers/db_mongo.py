@@ -8,12 +8,15 @@
 """
 Tools to convert haystack filter to mongo request
 """
+import functools
 from datetime import datetime, date, time
-from typing import Optional, Dict, Any, List, Union, cast
+from typing import Optional, Dict, Any, List, Union, Callable, cast
 
-from shaystack import parse_filter, HaystackType, Quantity, Ref
+from shaystack import HaystackType, Quantity, Ref
 from shaystack.filter_ast import FilterNode, FilterUnary, FilterPath, FilterBinary
+from shaystack.grid_filter import _cached_parse_filter
 from ..jsondumper import dump_scalar as json_dump_scalar
+from ..type import Entity
 
 _simple_ops = {
     "==": "$eq",
@@ -30,6 +33,19 @@ _relative_ops = {
     ">=": "$gte",
 }
 
+_EXPR_CACHE_SIZE = 2048
+
+# Patterns to extract the value of a Haystack JSON string
+_NUMERIC_MONGO_RE = r"n:([-+]?(?:[0-9]*\.)?[0-9]+(?:[eE][-+]?\d+)?)"
+_TIME_MONGO_RE = "h:([0-9:]+)"
+_DATETIME_MONGO_RE = "t:([^ ]+)"
+_DATE_MONGO_RE = "d:([0-9-]+)"
+_STR_MONGO_RE = "s:(.+)"
+_REF_MONGO_RE = "r:([:.~a-zA-Z0-9_-]+)"
+
+# Field in the stored entity, with the numeric value of each number tag
+_NUM_FIELD = "_num"
+
 
 def _to_float(scalar: HaystackType) -> float:
     if isinstance(scalar, Quantity):
@@ -39,6 +55,19 @@ def _to_float(scalar: HaystackType) -> float:
     raise ValueError("impossible to compare with anything other than a number")
 
 
+def _extract_numeric(entity: Entity) -> Dict[str, float]:
+    """
+    Extract the numeric tags of an entity, to save them with the entity.
+    Args:
+        entity: The entity to save
+
+    Returns:
+        The value of each number or quantity tag
+    """
+    return {k: float(_to_float(v)) for k, v in entity.items()
+            if isinstance(v, (Quantity, int, float)) and not isinstance(v, bool)}
+
+
 def _search_paths(node: Union[FilterNode, HaystackType], acc: List[List[str]]) -> None:
     if isinstance(node, FilterUnary):
         _search_paths(node.right, acc)
@@ -100,150 +129,170 @@ def _join_stages(node: Union[FilterNode, HaystackType],
 
 def _conv_filter(node: Union[FilterNode, HaystackType]) -> Union[Dict[str, Any], str]:
     """ Convert a haystack filter to MongoDB expression """
-    if isinstance(node, FilterUnary):
-        if node.operator == "has":
-            return {"$ne": [{"$type": f"${_conv_filter(node.right)}"}, "missing"]}
-        if node.operator == "not":
-            if isinstance(node.right, FilterPath):
-                return {"$eq": [{"$type": f"${_conv_filter(node.right)}"}, "missing"]}
-            return {"$cond": {"if": _conv_filter(node.right), "then": 0, "else": 1}}
-    if isinstance(node, FilterPath):
-        return "_entity_.".join(node.paths)
-    if isinstance(node, FilterBinary):
-        if node.operator in _simple_ops:
-            if isinstance(node.right, Ref):
-                path = _conv_filter(node.left)
-                var = cast(FilterPath, node.left).paths[0]
-                to_ref = _to_ref(path, var)
-
-                return {_simple_ops[node.operator]: [
-                    to_ref,
-                    node.right.name,
-                ]}
-            return {_simple_ops[node.operator]: [
-                f"${_conv_filter(node.left)}",
-                _conv_filter(node.right)[1:-1],  # type: ignore
-            ]}
-        if node.operator in _logical_ops:
-            return {_logical_ops[node.operator]: [
-                _conv_filter(node.left),
-                _conv_filter(node.right),
-            ]}
-        if node.operator in _relative_ops:
+    handler = _HANDLERS.get(type(node))
+    if handler:
+        return handler(node)
+    return json_dump_scalar(node)
+
+
+def _conv_unary(node: FilterUnary) -> Union[Dict[str, Any], str]:
+    if node.operator == "has":
+        return {"$ne": [{"$type": f"${_conv_filter(node.right)}"}, "missing"]}
+    if node.operator == "not":
+        if isinstance(node.right, FilterPath):
+            return {"$eq": [{"$type": f"${_conv_filter(node.right)}"}, "missing"]}
+        return {"$cond": {"if": _conv_filter(node.right), "then": 0, "else": 1}}
+    raise ValueError("Invalid operator")
+
+
+def _conv_path(node: FilterPath) -> str:
+    return "_entity_.".join(node.paths)
+
+
+def _conv_binary(node: FilterBinary) -> Union[Dict[str, Any], str]:
+    if node.operator in _simple_ops:
+        if isinstance(node.right, Ref):
             path = _conv_filter(node.left)
             var = cast(FilterPath, node.left).paths[0]
+            to_ref = _to_ref(path, var)
+
+            return {_simple_ops[node.operator]: [
+                to_ref,
+                node.right.name,
+            ]}
+        return {_simple_ops[node.operator]: [
+            f"${_conv_filter(node.left)}",
+            _conv_filter(node.right)[1:-1],  # type: ignore
+        ]}
+    if node.operator in _logical_ops:
+        return {_logical_ops[node.operator]: [
+            _conv_filter(node.left),
+            _conv_filter(node.right),
+        ]}
+    if node.operator in _relative_ops:
+        path = _conv_filter(node.left)
+        var = cast(FilterPath, node.left).paths[0]
 
-            if isinstance(node.right, (Quantity, int, float)):
-                to_double = {
-                    "$let": {
-                        "vars": {
-                            f"{var}_regex_": {
-                                "$regexFind": {
-                                    "input": f"${path}",
-                                    "regex": "n:([-+]?([0-9]*[.])?[0-9]+([eE][-+]?\\d+)?)"
-                                }
+        if isinstance(node.right, (Quantity, int, float)):
+            to_double = {
+                "$let": {
+                    "vars": {
+                        f"{var}_regex_": {
+                            "$regexFind": {
+                                "input": f"${path}",
+                                "regex": _NUMERIC_MONGO_RE
                             }
-                        },
-                        "in": {"$toDouble": {
-                            "$arrayElemAt": [f"$${var}_regex_.captures", 0]
-                        }}
-                    }
+                        }
+                    },
+                    "in": {"$toDouble": {
+                        "$arrayElemAt": [f"$${var}_regex_.captures", 0]
+                    }}
                 }
+            }
 
-                return {_relative_ops[node.operator]: [
-                    to_double,
-                    _to_float(cast(HaystackType, node.right)),
-                ]}
-            if isinstance(node.right, time):
-                to_date = {
-                    "$let": {
-                        "vars": {
-                            f"{var}_regex_": {
-                                "$regexFind": {
-                                    "input": f"${path}",
-                                    "regex": "h:([0-9:]+)"
-                                }
-                            }
-                        },
-                        "in": {"$toDate":
-                            {
-                                '$concat':
-                                    [
-                                        '2000-1-1T',
-                                        {"$arrayElemAt": [f"$${var}_regex_.captures", 0]}
-                                    ]
+            # Use the value saved with the entity, else parse the string
+            paths = cast(FilterPath, node.left).paths
+            num_path = "_entity_.".join(paths[:-1] + [f"{_NUM_FIELD}.{paths[-1]}"])
+            return {_relative_ops[node.operator]: [
+                {"$ifNull": [f"${num_path}", to_double]},
+                _to_float(cast(HaystackType, node.right)),
+            ]}
+        if isinstance(node.right, time):
+            to_date = {
+                "$let": {
+                    "vars": {
+                        f"{var}_regex_": {
+                            "$regexFind": {
+                                "input": f"${path}",
+                                "regex": _TIME_MONGO_RE
                             }
                         }
+                    },
+                    "in": {"$toDate":
+                        {
+                            '$concat':
+                                [
+                                    '2000-1-1T',
+                                    {"$arrayElemAt": [f"$${var}_regex_.captures", 0]}
+                                ]
+                        }
                     }
                 }
-                return {_relative_ops[node.operator]: [
-                    to_date,
-                    datetime.combine(date(2000, 1, 1), node.right),
-                    # node.right
-                ]}
-            if isinstance(node.right, datetime):
-                to_date = {
-                    "$let": {
-                        "vars": {
-                            f"{var}_regex_": {
-                                "$regexFind": {
-                                    "input": f"${path}",
-                                    "regex": "t:([^ ]+)"
-                                }
+            }
+            return {_relative_ops[node.operator]: [
+                to_date,
+                datetime.combine(date(2000, 1, 1), node.right),
+                # node.right
+            ]}
+        if isinstance(node.right, datetime):
+            to_date = {
+                "$let": {
+                    "vars": {
+                        f"{var}_regex_": {
+                            "$regexFind": {
+                                "input": f"${path}",
+                                "regex": _DATETIME_MONGO_RE
                             }
-                        },
-                        "in": {"$toDate": {
-                            "$arrayElemAt": [f"$${var}_regex_.captures", 0]
-                        }}
-                    }
+                        }
+                    },
+                    "in": {"$toDate": {
+                        "$arrayElemAt": [f"$${var}_regex_.captures", 0]
+                    }}
                 }
-                return {_relative_ops[node.operator]: [
-                    to_date,
-                    node.right,
-                ]}
-            if isinstance(node.right, date):
-                to_date = {
-                    "$let": {
-                        "vars": {
-                            f"{var}_regex_": {
-                                "$regexFind": {
-                                    "input": f"${path}",
-                                    "regex": "d:([0-9-]+)"
-                                }
+            }
+            return {_relative_ops[node.operator]: [
+                to_date,
+                node.right,
+            ]}
+        if isinstance(node.right, date):
+            to_date = {
+                "$let": {
+                    "vars": {
+                        f"{var}_regex_": {
+                            "$regexFind": {
+                                "input": f"${path}",
+                                "regex": _DATE_MONGO_RE
                             }
-                        },
-                        "in": {"$toDate": {
-                            "$arrayElemAt": [f"$${var}_regex_.captures", 0]
-                        }}
-                    }
+                        }
+                    },
+                    "in": {"$toDate": {
+                        "$arrayElemAt": [f"$${var}_regex_.captures", 0]
+                    }}
                 }
-                return {_relative_ops[node.operator]: [
-                    to_date,
-                    datetime.combine(node.right, time()),
-                ]}
-            if isinstance(node.right, str):
-                to_str = {
-                    "$let": {
-                        "vars": {
-                            f"{var}_regex_": {
-                                "$regexFind": {
-                                    "input": f"${path}",
-                                    "regex": "s:(.+)"
-                                }
+            }
+            return {_relative_ops[node.operator]: [
+                to_date,
+                datetime.combine(node.right, time()),
+            ]}
+        if isinstance(node.right, str):
+            to_str = {
+                "$let": {
+                    "vars": {
+                        f"{var}_regex_": {
+                            "$regexFind": {
+                                "input": f"${path}",
+                                "regex": _STR_MONGO_RE
                             }
-                        },
-                        "in": {
-                            "$arrayElemAt": [f"$${var}_regex_.captures", 0]
                         }
+                    },
+                    "in": {
+                        "$arrayElemAt": [f"$${var}_regex_.captures", 0]
                     }
                 }
-                return {_relative_ops[node.operator]: [
-                    to_str,
-                    node.right,
-                ]}
+            }
+            return {_relative_ops[node.operator]: [
+                to_str,
+                node.right,
+            ]}
 
-        raise ValueError("Invalid operator")
-    return json_dump_scalar(node)
+    raise ValueError("Invalid operator")
+
+
+_HANDLERS: Dict[type, Callable[[Any], Union[Dict[str, Any], str]]] = {
+    FilterUnary: _conv_unary,
+    FilterPath: _conv_path,
+    FilterBinary: _conv_binary,
+}
 
 
 def _to_ref(path, var):
@@ -253,7 +302,7 @@ def _to_ref(path, var):
                 f"{var}_regex_": {
                     "$regexFind": {
                         "input": f"${path}",
-                        "regex": "r:([:.~a-zA-Z0-9_-]+)"
+                        "regex": _REF_MONGO_RE
                     }
                 }
             },
@@ -265,6 +314,12 @@ def _to_ref(path, var):
     return to_ref
 
 
+@functools.lru_cache(maxsize=_EXPR_CACHE_SIZE)
+def _filter_expr(grid_filter: str) -> Union[Dict[str, Any], str]:
+    # Independent of the version and customer, and never modified by the pipeline
+    return _conv_filter(_cached_parse_filter(grid_filter).head)
+
+
 def _mongo_filter(grid_filter: Optional[str],
                   version: datetime,
                   limit: int = 0,
@@ -282,7 +337,7 @@ def _mongo_filter(grid_filter: Optional[str],
             },
             {"$replaceRoot": {"newRoot": "$entity"}},
         ]
-    haystack_filter = parse_filter(grid_filter)
+    haystack_filter = _cached_parse_filter(grid_filter)
 
     # 1. Init stages
     stages = [
@@ -302,14 +357,14 @@ def _mongo_filter(grid_filter: Optional[str],
     # 2. Add stage for join entities
     join_stages = _join_stages(haystack_filter.head, customer_id, version)
     if join_stages:
-        stages.extend(_join_stages(haystack_filter.head, customer_id, version))
+        stages.extend(join_stages)
 
     # 3. Add expr
     stages.append(
         {
             "$match":
                 {
-                    "$expr": _conv_filter(haystack_filter.head)
+                    "$expr": _filter_expr(grid_filter)
                 }
         })
 
@@ -9,12 +9,12 @@ Save Haystack ontology in SQLite database with JSon extension.
 Convert the haystack filter to sqlite SQL equivalent syntax.
 """
 import datetime
-import itertools
+import functools
 import json
 import logging
 import textwrap
 from dataclasses import dataclass
-from typing import Dict, Any, Optional, List, Tuple, Union, Iterator, Callable, cast
+from typing import Dict, Any, Optional, List, Tuple, Union, Callable, Set, cast
 
 import pytz
 
@@ -24,98 +24,112 @@ from ..filter_ast import FilterNode, FilterUnary, FilterBinary, FilterPath
 
 log = logging.getLogger("db.Provider")
 
+_TEMPLATE_CACHE_SIZE = 32
+_SQL_CACHE_SIZE = 2048
 
-def _sqlescape(a_str: str) -> str:
-    return a_str.translate(
-        str.maketrans({  # type: ignore
-            "\0": "\\0",
-            "\r": "\\r",
-            "\x08": "\\b",
-            "\x09": "\\t",
-            "\x1a": "\\z",
-            "\n": "\\n",
-            "\"": "",
-            "'": "",
-            "\\": "\\\\",
-            "%": "\\%"
-        }))
+# Markers for the parameters known only when the request is executed
+_VERSION_PARAM = object()
+_CUSTOMER_ID_PARAM = object()
+
+
+def _hops(node: Union[FilterNode, Any]) -> Set[Tuple[str, ...]]:
+    """ Return the references to follow to read the tags of the tree """
+    if isinstance(node, FilterUnary):
+        return _hops(node.right)
+    if isinstance(node, FilterBinary):
+        return _hops(node.left) | _hops(node.right)
+    if isinstance(node, FilterPath):
+        return {tuple(node.paths[:i]) for i in range(1, len(node.paths))}
+    return set()
+
+
+def _required_hops(node: Union[FilterNode, Any]) -> Set[Tuple[str, ...]]:
+    """ Return the references that must exist for an entity to match the tree """
+    if isinstance(node, FilterBinary):
+        if node.operator == "and":
+            return _required_hops(node.left) | _required_hops(node.right)
+        if node.operator == "or":
+            return _required_hops(node.left) & _required_hops(node.right)
+    return _hops(node)
 
 
 def _use_inner_join(node: FilterNode) -> bool:
     """ Return True if the tree must use inner join """
-    if isinstance(node, FilterUnary):
-        return len(cast(FilterPath, node.right).paths) > 1
     if isinstance(node, FilterBinary):
         if isinstance(node.left, _FilterDate):
             return False
+        # The joins of a block exclude the entities without the references,
+        # so an `or` must not join a reference needed by only one side
+        if node.operator == "or" and not _hops(node) <= _required_hops(node):
+            return True
         return _use_inner_join(node.left) or _use_inner_join(node.right)
     return False
 
 
 def _generate_path(table_name: str,
-                   customer_id: str,
-                   version: datetime.datetime,
-                   select: List[Union[str, List[Any]]],
-                   where: List[Union[str, List[Any]]],
+                   select: List[str],
+                   sql_params: List[Any],
                    node: FilterPath,
-                   num_table: int) -> Tuple[int, List[Union[str, List[Any]]], List[Union[str, List[Any]]]]:
-    if len(node.paths) == 1:
-        return num_table, select, where
-    first = True
-    for path in node.paths[:-1]:
-        num_table += 1
-        if first:
-            select.append(f"INNER JOIN {table_name} AS t{num_table} ON\n")
-        else:
-            select.append("".join(_flatten(where)) + ")\n")
-            where = []
-            select.append(f"INNER JOIN {table_name} AS t{num_table} ON\n")
-            where.append('(')
-        where.extend(
-            ['(',
-             _select_version(version, num_table),
-             f"AND t{num_table}.customer_id='{customer_id}'\n",
-             f"AND json_object(json(t{num_table - 1}.entity),'$.{path}') = "
-             f"json_object(json(t{num_table}.entity),'$.id'))\n"
-             ])
-        first = False
-    where.append("AND ")
-    return num_table, select, where
+                   num_table: int,
+                   joined: Dict[Tuple[str, ...], int]) -> Tuple[int, int]:
+    """ Join the referenced entities, and return the last table number and the table with the tag """
+    path_table = joined[()]
+    for i in range(1, len(node.paths)):
+        hops = tuple(node.paths[:i])
+        if hops not in joined:
+            # Each reference is joined once per block
+            num_table += 1
+            select.extend(
+                [_inner_join_template(table_name).format(num_table=num_table),
+                 '(',
+                 _select_version(num_table),
+                 f"AND t{num_table}.customer_id=?\n",
+                 f"AND json_extract(t{path_table}.entity,'$.{node.paths[i - 1]}') = "
+                 f"json_extract(t{num_table}.entity,'$.id'))\n"
+                 ])
+            # The joins are before the WHERE clause, and all have the same parameters
+            sql_params[:0] = (_VERSION_PARAM, _CUSTOMER_ID_PARAM)
+            joined[hops] = num_table
+        path_table = joined[hops]
+    return num_table, path_table
 
 
 def _generate_filter_in_sql(table_name: str,
-                            customer_id: str,
-                            version: datetime.datetime,
-                            select: List[Union[str, List[Any]]],
-                            where: List[Union[str, List[Any]]],
+                            select: List[str],
+                            where: List[str],
+                            sql_params: List[Any],
                             node: FilterNode,
-                            num_table: int
-                            ) -> Tuple[int, List[Union[str, List[Any]]], List[Union[str, List[Any]]]]:
+                            num_table: int,
+                            joined: Dict[Tuple[str, ...], int]
+                            ) -> Tuple[int, List[str], List[str]]:
     # Use RootBlock nodes
     if isinstance(node, _FilterDate):
         where.extend(
             ["(",
-             _select_version(node.version, node.num_table),
-             f"AND t{node.num_table}.customer_id='{node.customer_id}')\n"
+             _select_version(node.num_table),
+             f"AND t{node.num_table}.customer_id=?)\n"
              ])
+        sql_params.extend((_VERSION_PARAM, _CUSTOMER_ID_PARAM))
 
     elif isinstance(node, FilterUnary):
         if node.operator == "has":
             assert isinstance(node.right, FilterPath)
-            num_table, select, where = \
-                _generate_path(table_name, customer_id, version,
-                               select, where,
+            num_table, path_table = \
+                _generate_path(table_name,
+                               select, sql_params,
                                node.right,
-                               num_table)
-            where.append(f"json_extract(json(t{num_table}.entity),'$.{node.right.paths[-1]}') IS NOT NULL\n")
+                               num_table,
+                               joined)
+            where.append(f"json_extract(t{path_table}.entity,'$.{node.right.paths[-1]}') IS NOT NULL\n")
         elif node.operator == "not":
             assert isinstance(node.right, FilterPath)
-            num_table, select, where = \
-                _generate_path(table_name, customer_id, version,
-                               select, where,
+            num_table, path_table = \
+                _generate_path(table_name,
+                               select, sql_params,
                                node.right,
-                               num_table)
-            where.append(f"json_extract(json(t{num_table}.entity),'$.{node.right.paths[-1]}') IS NULL\n")
+                               num_table,
+                               joined)
+            where.append(f"json_extract(t{path_table}.entity,'$.{node.right.paths[-1]}') IS NULL\n")
         else:
             assert False
 
@@ -127,44 +141,50 @@ def _generate_filter_in_sql(table_name: str,
                     log.warning("SQLite can not implement this request. Result may be invalid")
                 if isinstance(node.right, FilterBinary) and _use_inner_join(node.right):
                     log.warning("SQLite can not implement this request. Result may be invalid")
-                generated_sql = []
-                num_table, sql = _generate_sql_block(table_name, customer_id, version,
-                                                     0,
-                                                     node.left,
-                                                     num_table)
+                generated_sql: List[str] = []
+                # The current select and where are replaced, with their parameters
+                sql_params.clear()
+                num_table, sql, block_params = _generate_sql_block(table_name,
+                                                                   0,
+                                                                   node.left,
+                                                                   num_table)
                 generated_sql.append(sql)
+                sql_params.extend(block_params)
                 if node.operator == "and":
                     generated_sql.append("INTERSECT")
                 else:
                     generated_sql.append("UNION")
                 num_table += 1
-                num_table, sql = _generate_sql_block(table_name, customer_id, version,
-                                                     0,
-                                                     node.right,
-                                                     num_table)
+                num_table, sql, block_params = _generate_sql_block(table_name,
+                                                                   0,
+                                                                   node.right,
+                                                                   num_table)
                 generated_sql.append(sql)
-                select = generated_sql  # type: ignore
+                sql_params.extend(block_params)
+                select = generated_sql
                 where = []
             else:
                 where.append('(')
                 parent_left = isinstance(node.left, FilterBinary) and node.left.operator in ["and", "or"]
-                num_table, select, where = _generate_filter_in_sql(table_name, customer_id, version,
+                num_table, select, where = _generate_filter_in_sql(table_name,
                                                                    select,
                                                                    where,
+                                                                   sql_params,
                                                                    node.left,
-                                                                   num_table)
+                                                                   num_table,
+                                                                   joined)
                 if parent_left:
-                    where = \
-                        ["".join(_flatten(where))[:-1],
-                         f"\n{node.operator.upper()} "
-                         ]
+                    where[-1] = where[-1][:-1]
+                    where.append(f"\n{node.operator.upper()} ")
                 else:
                     where.append(f"{node.operator.upper()} ")
-                num_table, select, where = _generate_filter_in_sql(table_name, customer_id, version,
+                num_table, select, where = _generate_filter_in_sql(table_name,
                                                                    select,
                                                                    where,
+                                                                   sql_params,
                                                                    node.right,
-                                                                   num_table)
+                                                                   num_table,
+                                                                   joined)
                 if where:
                     where.append(")\n")
         else:
@@ -173,160 +193,186 @@ def _generate_filter_in_sql(table_name: str,
                 value = value.m
             if isinstance(value, (int, float)) and node.operator not in ('==', '!='):
                 # Comparison with numbers. Must remove the header 'n:'
-                num_table, select, where = \
-                    _generate_path(table_name, customer_id, version,
-                                   select, where,
+                num_table, path_table = \
+                    _generate_path(table_name,
+                                   select, sql_params,
                                    cast(FilterPath, node.left),
-                                   num_table)
+                                   num_table,
+                                   joined)
                 where.extend([
-                    f"CAST(substr(json_extract(json(t{num_table}.entity),"
+                    f"CAST(substr(json_extract(t{path_table}.entity,"
                     f"'$.{cast(FilterPath, node.left).paths[-1]}'),3) AS REAL)",
-                    f" {node.operator} {value}\n",
+                    f" {node.operator} ?\n",
                 ])
+                sql_params.append(value)
             elif isinstance(value, datetime.time) and node.operator not in ('==', '!='):
                 # Comparison with hour. Must remove the header 'h:'
-                num_table, select, where = \
-                    _generate_path(table_name, customer_id, version,
-                                   select, where,
+                num_table, path_table = \
+                    _generate_path(table_name,
+                                   select, sql_params,
                                    cast(FilterPath, node.left),
-                                   num_table)
+                                   num_table,
+                                   joined)
                 where.extend([
-                    f"time(substr(json_extract(json(t{num_table}.entity),"
+                    f"time(substr(json_extract(t{path_table}.entity,"
                     f"'$.{cast(FilterPath, node.left).paths[-1]}'),3))",
-                    f" {node.operator} time('{value}')\n",
+                    f" {node.operator} time(?)\n",
                 ])
+                sql_params.append(value.isoformat())
             elif isinstance(value, datetime.datetime) and node.operator not in ('==', '!='):
                 # Comparison with numbers. Must remove the header 't:'
-                num_table, select, where = \
-                    _generate_path(table_name, customer_id, version,
-                                   select, where,
+                num_table, path_table = \
+                    _generate_path(table_name,
+                                   select, sql_params,
                                    cast(FilterPath, node.left),
-                                   num_table)
+                                   num_table,
+                                   joined)
                 where.extend([
-                    f"datetime(substr(json_extract(json(t{num_table}.entity),"
+                    f"datetime(substr(json_extract(t{path_table}.entity,"
                     f"'$.{cast(FilterPath, node.left).paths[-1]}'),3,25))",
-                    f" {node.operator} datetime('{value.isoformat()}')\n",
+                    f" {node.operator} datetime(?)\n",
                 ])
+                sql_params.append(value.isoformat())
             elif isinstance(value, datetime.date) and node.operator not in ('==', '!='):
                 # Comparison with date. Must remove the header 'd:'
-                num_table, select, where = \
-                    _generate_path(table_name, customer_id, version,
-                                   select, where,
+                num_table, path_table = \
+                    _generate_path(table_name,
+                                   select, sql_params,
                                    cast(FilterPath, node.left),
-                                   num_table)
+                                   num_table,
+                                   joined)
                 where.extend([
-                    f"date(substr(json_extract(json(t{num_table}.entity),"
+                    f"date(substr(json_extract(t{path_table}.entity,"
                     f"'$.{cast(FilterPath, node.left).paths[-1]}'),3))",
-                    f" {node.operator} date('{value}')\n",
+                    f" {node.operator} date(?)\n",
                 ])
+                sql_params.append(value.isoformat())
             elif isinstance(value, str) and node.operator not in ('==', '!='):
                 # Comparison with str. Must remove the header 's:'
-                num_table, select, where = \
-                    _generate_path(table_name, customer_id, version,
-                                   select, where,
+                num_table, path_table = \
+                    _generate_path(table_name,
+                                   select, sql_params,
                                    cast(FilterPath, node.left),
-                                   num_table)
+                                   num_table,
+                                   joined)
                 where.extend([
-                    f"substr(json_extract(json(t{num_table}.entity),"
+                    f"substr(json_extract(t{path_table}.entity,"
                     f"'$.{cast(FilterPath, node.left).paths[-1]}'),3)",
-                    f" {node.operator} '{_sqlescape(value)}'\n",
+                    f" {node.operator} ?\n",
                 ])
+                sql_params.append(value)
             else:
                 assert node.operator in ('==', '!='), "Operator not supported for this type"
-                num_table, select, where = \
-                    _generate_path(table_name, customer_id, version,
-                                   select, where,
+                num_table, path_table = \
+                    _generate_path(table_name,
+                                   select, sql_params,
                                    cast(FilterPath, node.left),
-                                   num_table)
+                                   num_table,
+                                   joined)
                 if value is None:
                     if node.operator == '!=':
                         where.append(
-                            f"json_extract(json(t{num_table}.entity),"
+                            f"json_extract(t{path_table}.entity,"
                             f"'$.{cast(FilterPath, node.left).paths[-1]}') "
                             f"IS NOT NULL\n")
                     else:
                         where.append(
-                            f"json_extract(json(t{num_table}.entity),"
+                            f"json_extract(t{path_table}.entity,"
                             f"'$.{cast(FilterPath, node.left).paths[-1]}') "
                             f"IS NULL\n")
                 else:
                     if isinstance(value, Ref):
                         where.append(
-                            f"json_extract(json(t{num_table}.entity),"
+                            f"json_extract(t{path_table}.entity,"
                             f"'$.{cast(FilterPath, node.left).paths[-1]}') "
-                            f"LIKE '{str(json.loads(jsondumper.dump_scalar(value)))}%'\n")
+                            "LIKE ?\n")
+                        sql_params.append(f"{str(json.loads(jsondumper.dump_scalar(value)))}%")
                     else:
                         where.append(
-                            f"json_extract(json(t{num_table}.entity),"
+                            f"json_extract(t{path_table}.entity,"
                             f"'$.{cast(FilterPath, node.left).paths[-1]}') "
-                            f"{node.operator} '{str(json.loads(jsondumper.dump_scalar(value)))}'\n")
+                            f"{node.operator} ?\n")
+                        sql_params.append(str(json.loads(jsondumper.dump_scalar(value))))
 
     else:
         assert False, "Invalid node"
     return num_table, select, where
 
 
-def _flatten(a_list: List[Any]) -> Iterator[Any]:
-    return itertools.chain.from_iterable(a_list)
+@functools.lru_cache(maxsize=_TEMPLATE_CACHE_SIZE)
+def _select_template(table_name: str) -> str:
+    return textwrap.dedent(f"""
+        SELECT t{{num_table}}.entity
+        FROM {table_name} as t{{num_table}}
+        """)
+
 
+@functools.lru_cache(maxsize=_TEMPLATE_CACHE_SIZE)
+def _inner_join_template(table_name: str) -> str:
+    return f"INNER JOIN {table_name} AS t{{num_table}} ON\n"
 
-def _select_version(version: datetime.datetime, num_table: int) -> str:
-    return f"datetime('{version.isoformat()}') " \
+
+def _select_version(num_table: int) -> str:
+    return "datetime(?) " \
            f"BETWEEN datetime(t{num_table}.start_datetime) " \
            f"AND datetime(t{num_table}.end_datetime)\n"
 
 
 @dataclass
 class _FilterDate(FilterNode):
-    version: datetime.datetime
     num_table: int
-    customer_id: str
 
 
 def _generate_sql_block(table_name: str,
-                        customer_id: str,
-                        version: datetime.datetime,
                         limit: int,
                         node: FilterNode,
-                        num_table: int) -> Tuple[int, str]:
-    init_num_table = num_table
-    select = [textwrap.dedent(f"""
-        SELECT t{num_table}.entity
-        FROM {table_name} as t{num_table}
-        """)]
+                        num_table: int) -> Tuple[int, str, List[Any]]:
+    select = [_select_template(table_name).format(num_table=num_table)]
+    sql_params: List[Any] = []
 
     num_table, select, where = _generate_filter_in_sql(
-        table_name, customer_id, version,
-        select,  # type: ignore
+        table_name,
+        select,
         [],
-        FilterBinary("and", _FilterDate(version, num_table, customer_id), node),
-        num_table
+        sql_params,
+        FilterBinary("and", _FilterDate(num_table), node),
+        num_table,
+        {(): num_table}
     )
 
-    generated_sql = "".join(_flatten(select))
-    if init_num_table == num_table:
-        generated_sql += "WHERE\n"
-    generated_sql += "".join(_flatten(where))
-
+    # Without WHERE clause, the block is an INTERSECT or UNION of sub-blocks
+    if where:
+        select.append("WHERE\n")
+        select.extend(where)
     if limit > 0:
-        generated_sql += f"LIMIT {limit}\n"
-    return num_table, generated_sql
+        select.append(f"LIMIT {limit}\n")
+    return num_table, "".join(select), sql_params
 
 
-def _sql_filter(table_name: str,
-                grid_filter: Optional[str],
-                version: datetime.datetime,
-                limit: int = 0,
-                customer_id: str = '') -> str:
-    _, sql = _generate_sql_block(
+@functools.lru_cache(maxsize=_SQL_CACHE_SIZE)
+def _compiled_sql(table_name: str,
+                  grid_filter: str,
+                  limit: int) -> Tuple[str, Tuple[Any, ...]]:
+    # The version and customer id are bound when the request is executed
+    _, sql, sql_params = _generate_sql_block(
         table_name,
-        customer_id,
-        version,
         limit,
         parse_filter(grid_filter).head,  # type: ignore
         num_table=1)
-    sql_request = f'-- {grid_filter}{sql}'
-    return sql_request
+    return f'-- {grid_filter}{sql}', tuple(sql_params)
+
+
+def _sql_filter(table_name: str,
+                grid_filter: Optional[str],
+                version: datetime.datetime,
+                limit: int = 0,
+                customer_id: str = '') -> Tuple[str, List[Any]]:
+    sql_request, sql_params = _compiled_sql(table_name, grid_filter, limit)  # type: ignore
+    version_iso = version.isoformat()
+    return sql_request, [version_iso if param is _VERSION_PARAM
+                         else customer_id if param is _CUSTOMER_ID_PARAM
+                         else param
+                         for param in sql_params]
 
 
 def _exec_sql_filter(params: Dict[str, Any],
@@ -340,13 +386,13 @@ def _exec_sql_filter(params: Dict[str, Any],
         cursor.execute(params["SELECT_ENTITY"], (version, customer_id))
         return cursor
 
-    sql_request = _sql_filter(
+    sql_request, sql_params = _sql_filter(
         table_name,
         grid_filter,
         version,
         limit,
         customer_id)  # type: ignore
-    cursor.execute(sql_request)
+    cursor.execute(sql_request, sql_params)
     return cursor
 
 
@@ -380,7 +426,8 @@ def get_db_parameters(table_name: str) -> Dict[str, Union[Callable, str]]:
         "CREATE_HAYSTACK_INDEX_1": textwrap.dedent(f'''
             CREATE INDEX IF NOT EXISTS {table_name}_index ON {table_name}(id, customer_id)
             '''),
-        "CREATE_HAYSTACK_INDEX_2": textwrap.dedent('''
+        "CREATE_HAYSTACK_INDEX_2": textwrap.dedent(f'''
+            CREATE INDEX IF NOT EXISTS {table_name}_id_index ON {table_name}(json_extract(entity,'$.id'))
             '''),
         "CREATE_METADATA_TABLE": textwrap.dedent(f'''
             CREATE TABLE IF NOT EXISTS {table_name}_meta_datas
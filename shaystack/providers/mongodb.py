@@ -27,7 +27,8 @@ from pymongo.collection import Collection
 from pymongo.database import Database
 
 from .db_haystack_interface import DBHaystackInterface
-from .db_mongo import _mongo_filter as mongo_filter
+from .db_mongo import _mongo_filter as mongo_filter, _extract_numeric, _NUM_FIELD, \
+    _REF_MONGO_RE
 from .tools import _BOTO3_AVAILABLE, get_secret_manager_secret
 from .url import read_grid_from_uri
 from .. import Entity, LATEST_VER, re
@@ -42,11 +43,15 @@ _END_OF_WORLD = datetime.max.replace(tzinfo=pytz.UTC)
 
 
 def _conv_entity_to_row(entity: Entity) -> Dict[str, Any]:
-    return {k: json_dump_scalar(v)[1:-1] for k, v in entity.items()}
+    row: Dict[str, Any] = {k: json_dump_scalar(v)[1:-1] for k, v in entity.items()}
+    numeric = _extract_numeric(entity)
+    if numeric:
+        row[_NUM_FIELD] = numeric
+    return row
 
 
 def _conv_row_to_entity(row: Dict[str, Any]) -> Entity:
-    return {k: json_parse_scalar(v) for k, v in row.items()}
+    return {k: json_parse_scalar(v) for k, v in row.items() if k != _NUM_FIELD}
 
 
 # noinspection PyPep8,PyPep8,PyPep8,PyPep8
@@ -178,7 +183,7 @@ class Provider(DBHaystackInterface):
                                             {
                                                 '$regexFind': {
                                                     'input': '$id',
-                                                    'regex': 'r:([:.~a-zA-Z0-9_-]+)'
+                                                    'regex': _REF_MONGO_RE
                                                 }
                                             }
                                         },
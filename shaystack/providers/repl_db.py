@@ -88,12 +88,12 @@ def main():
         def do_sqlite(self, arg: str) -> None:
             # noinspection PyBroadException
             try:
-                sql_request = sqlite_sql_filter("haystack", arg, FAKE_NOW, 1, "customer")
+                sql_request, sql_params = sqlite_sql_filter("haystack", arg, FAKE_NOW, 1, "customer")
                 print(sql_request)
                 print()
                 if scheme.startswith("sqlite") and isinstance(self.provider, SQLProvider):
                     cursor = self.provider.get_connect().cursor()
-                    cursor.execute(sql_request)
+                    cursor.execute(sql_request, tuple(sql_params))
                     cursor.close()
             except Exception:  # pylint: disable=broad-except
                 traceback.print_exc()
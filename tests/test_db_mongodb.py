@@ -9,10 +9,12 @@ from typing import cast, Dict, Any, List
 
 import pytz
 
+from shaystack import MARKER, Quantity, Ref
 from shaystack.providers import get_provider
 # noinspection PyProtectedMember
-from shaystack.providers.db_mongo import _mongo_filter as mongo_filter
-from shaystack.providers.mongodb import Provider as MongoProvider
+from shaystack.providers.db_mongo import _mongo_filter as mongo_filter, _extract_numeric
+# noinspection PyProtectedMember
+from shaystack.providers.mongodb import Provider as MongoProvider, _conv_entity_to_row, _conv_row_to_entity
 
 logging.basicConfig(level=os.environ.get("LOG_LEVEL", "WARNING"))
 
@@ -390,9 +392,9 @@ def test_greater_number():
     assert mongo_request == \
            [{'$match': {'customer_id': 'customer', 'start_datetime': {'$lte': FAKE_NOW},
                         'end_datetime': {'$gt': FAKE_NOW}}}, {'$replaceRoot': {'newRoot': '$entity'}}, {'$match': {
-               '$expr': {'$gt': [{'$let': {'vars': {'curVal_regex_': {
-                   '$regexFind': {'input': '$curVal', 'regex': 'n:([-+]?([0-9]*[.])?[0-9]+([eE][-+]?\\d+)?)'}}},
-                   'in': {'$toDouble': {'$arrayElemAt': ['$$curVal_regex_.captures', 0]}}}},
+               '$expr': {'$gt': [{'$ifNull': ['$_num.curVal', {'$let': {'vars': {'curVal_regex_': {
+                   '$regexFind': {'input': '$curVal', 'regex': 'n:([-+]?(?:[0-9]*\\.)?[0-9]+(?:[eE][-+]?\\d+)?)'}}},
+                   'in': {'$toDouble': {'$arrayElemAt': ['$$curVal_regex_.captures', 0]}}}}]},
                    1.0]}}}, {'$limit': 1}]
 
 
@@ -405,10 +407,11 @@ def test_greater_or_equal_number():
     assert mongo_request == \
            [{'$match': {'customer_id': 'customer', 'start_datetime': {'$lte': FAKE_NOW},
                         'end_datetime': {'$gt': FAKE_NOW}}}, {'$replaceRoot': {'newRoot': '$entity'}}, {'$match': {
-               '$expr': {'$gte': [{'$let': {'vars': {'geoPostalCode_regex_': {
-                   '$regexFind': {'input': '$geoPostalCode', 'regex': 'n:([-+]?([0-9]*[.])?[0-9]+([eE][-+]?\\d+)?)'}}},
+               '$expr': {'$gte': [{'$ifNull': ['$_num.geoPostalCode', {'$let': {'vars': {'geoPostalCode_regex_': {
+                   '$regexFind': {'input': '$geoPostalCode',
+                                  'regex': 'n:([-+]?(?:[0-9]*\\.)?[0-9]+(?:[eE][-+]?\\d+)?)'}}},
                    'in': {'$toDouble': {
-                       '$arrayElemAt': ['$$geoPostalCode_regex_.captures', 0]}}}}, 55400.0]}}},
+                       '$arrayElemAt': ['$$geoPostalCode_regex_.captures', 0]}}}}]}, 55400.0]}}},
             {'$limit': 1}]
 
 
@@ -421,10 +424,11 @@ def test_lower_number():
     assert mongo_request == \
            [{'$match': {'customer_id': 'customer', 'start_datetime': {'$lte': FAKE_NOW},
                         'end_datetime': {'$gt': FAKE_NOW}}}, {'$replaceRoot': {'newRoot': '$entity'}}, {'$match': {
-               '$expr': {'$lt': [{'$let': {'vars': {'geoPostalCode_regex_': {
-                   '$regexFind': {'input': '$geoPostalCode', 'regex': 'n:([-+]?([0-9]*[.])?[0-9]+([eE][-+]?\\d+)?)'}}},
+               '$expr': {'$lt': [{'$ifNull': ['$_num.geoPostalCode', {'$let': {'vars': {'geoPostalCode_regex_': {
+                   '$regexFind': {'input': '$geoPostalCode',
+                                  'regex': 'n:([-+]?(?:[0-9]*\\.)?[0-9]+(?:[eE][-+]?\\d+)?)'}}},
                    'in': {
-                       '$toDouble': {'$arrayElemAt': ['$$geoPostalCode_regex_.captures', 0]}}}},
+                       '$toDouble': {'$arrayElemAt': ['$$geoPostalCode_regex_.captures', 0]}}}}]},
                    55400.0]}}}, {'$limit': 1}]
 
 
@@ -437,10 +441,11 @@ def test_lower_or_equal_number():
     assert mongo_request == \
            [{'$match': {'customer_id': 'customer', 'start_datetime': {'$lte': FAKE_NOW},
                         'end_datetime': {'$gt': FAKE_NOW}}}, {'$replaceRoot': {'newRoot': '$entity'}}, {'$match': {
-               '$expr': {'$lte': [{'$let': {'vars': {'geoPostalCode_regex_': {
-                   '$regexFind': {'input': '$geoPostalCode', 'regex': 'n:([-+]?([0-9]*[.])?[0-9]+([eE][-+]?\\d+)?)'}}},
+               '$expr': {'$lte': [{'$ifNull': ['$_num.geoPostalCode', {'$let': {'vars': {'geoPostalCode_regex_': {
+                   '$regexFind': {'input': '$geoPostalCode',
+                                  'regex': 'n:([-+]?(?:[0-9]*\\.)?[0-9]+(?:[eE][-+]?\\d+)?)'}}},
                    'in': {'$toDouble': {
-                       '$arrayElemAt': ['$$geoPostalCode_regex_.captures', 0]}}}}, 55400.0]}}},
+                       '$arrayElemAt': ['$$geoPostalCode_regex_.captures', 0]}}}}]}, 55400.0]}}},
             {'$limit': 1}]
 
 
@@ -453,9 +458,9 @@ def test_greater_quantity():
     assert mongo_request == \
            [{'$match': {'customer_id': 'customer', 'start_datetime': {'$lte': FAKE_NOW},
                         'end_datetime': {'$gt': FAKE_NOW}}}, {'$replaceRoot': {'newRoot': '$entity'}}, {'$match': {
-               '$expr': {'$gt': [{'$let': {'vars': {'temp_regex_': {
-                   '$regexFind': {'input': '$temp', 'regex': 'n:([-+]?([0-9]*[.])?[0-9]+([eE][-+]?\\d+)?)'}}},
-                   'in': {'$toDouble': {'$arrayElemAt': ['$$temp_regex_.captures', 0]}}}},
+               '$expr': {'$gt': [{'$ifNull': ['$_num.temp', {'$let': {'vars': {'temp_regex_': {
+                   '$regexFind': {'input': '$temp', 'regex': 'n:([-+]?(?:[0-9]*\\.)?[0-9]+(?:[eE][-+]?\\d+)?)'}}},
+                   'in': {'$toDouble': {'$arrayElemAt': ['$$temp_regex_.captures', 0]}}}}]},
                    55400.0]}}}, {'$limit': 1}]
 
 
@@ -468,12 +473,26 @@ def test_greater_or_equal_quantity():
     assert mongo_request == \
            [{'$match': {'customer_id': 'customer', 'start_datetime': {'$lte': FAKE_NOW},
                         'end_datetime': {'$gt': FAKE_NOW}}}, {'$replaceRoot': {'newRoot': '$entity'}}, {'$match': {
-               '$expr': {'$gte': [{'$let': {'vars': {'temp_regex_': {
-                   '$regexFind': {'input': '$temp', 'regex': 'n:([-+]?([0-9]*[.])?[0-9]+([eE][-+]?\\d+)?)'}}},
-                   'in': {'$toDouble': {'$arrayElemAt': ['$$temp_regex_.captures', 0]}}}},
+               '$expr': {'$gte': [{'$ifNull': ['$_num.temp', {'$let': {'vars': {'temp_regex_': {
+                   '$regexFind': {'input': '$temp', 'regex': 'n:([-+]?(?:[0-9]*\\.)?[0-9]+(?:[eE][-+]?\\d+)?)'}}},
+                   'in': {'$toDouble': {'$arrayElemAt': ['$$temp_regex_.captures', 0]}}}}]},
                    55400.0]}}}, {'$limit': 1}]
 
 
+def test_extract_numeric():
+    entity = {'id': Ref('id1'), 'site': MARKER, 'curVal': 1, 'temp': Quantity(55400, '°'), 'enabled': True}
+    assert _extract_numeric(entity) == {'curVal': 1, 'temp': 55400}
+
+
+def test_numeric_not_in_entity():
+    entity = {'id': Ref('id1'), 'site': MARKER, 'curVal': 1.5, 'temp': Quantity(20, '°C'), 'big': 2 ** 70}
+    row = _conv_entity_to_row(entity)
+    assert row['_num'] == {'curVal': 1.5, 'temp': 20.0, 'big': float(2 ** 70)}
+    # Saved as doubles, even for int out of the BSON range
+    assert all(isinstance(value, float) for value in row['_num'].values())
+    assert _conv_row_to_entity(row) == entity
+
+
 # noinspection PyPep8
 def test_and_or():
     hs_filter = '(a or b) and (c or d)'
@@ -840,10 +859,10 @@ def test_2path_greater_quantity():
                        {'$eq': ['$entity.id', '$$siteRef_id_']}]}}}]}},
                {'$set': {'siteRef_entity_': {'$arrayElemAt': ['$siteRef_entity_.entity', 0]}}},
                {'$match': {'$expr': {'$gte': [
-                   {'$let': {'vars': {'siteRef_regex_': {
+                   {'$ifNull': ['$siteRef_entity_._num.temp', {'$let': {'vars': {'siteRef_regex_': {
                        '$regexFind': {'input': '$siteRef_entity_.temp',
-                                      'regex': 'n:([-+]?([0-9]*[.])?[0-9]+([eE][-+]?\\d+)?)'}}},
-                       'in': {'$toDouble': {'$arrayElemAt': ['$$siteRef_regex_.captures', 0]}}}}, 55400.0]}}},
+                                      'regex': 'n:([-+]?(?:[0-9]*\\.)?[0-9]+(?:[eE][-+]?\\d+)?)'}}},
+                       'in': {'$toDouble': {'$arrayElemAt': ['$$siteRef_regex_.captures', 0]}}}}]}, 55400.0]}}},
                {'$replaceRoot': {'newRoot': '$$ROOT'}},
                {'$limit': 10}]
 
@@ -880,11 +899,11 @@ def test_3path_greater_quantity():
                {'$set': {'siteRef_entity_.ownerRef_entity_': {
                    '$arrayElemAt': ['$siteRef_entity_.ownerRef_entity_.entity', 0]}}},
                {'$match': {'$expr': {'$gte': [
-                   {'$let': {'vars': {'siteRef_regex_': {
+                   {'$ifNull': ['$siteRef_entity_.ownerRef_entity_._num.temp', {'$let': {'vars': {'siteRef_regex_': {
                        '$regexFind': {
                            'input': '$siteRef_entity_.ownerRef_entity_.temp',
-                           'regex': 'n:([-+]?([0-9]*[.])?[0-9]+([eE][-+]?\\d+)?)'}}},
-                       'in': {'$toDouble': {'$arrayElemAt': ['$$siteRef_regex_.captures', 0]}}}}, 55400.0]}}},
+                           'regex': 'n:([-+]?(?:[0-9]*\\.)?[0-9]+(?:[eE][-+]?\\d+)?)'}}},
+                       'in': {'$toDouble': {'$arrayElemAt': ['$$siteRef_regex_.captures', 0]}}}}]}, 55400.0]}}},
                {'$replaceRoot': {'newRoot': '$$ROOT'}},
                {'$limit': 10}]
 
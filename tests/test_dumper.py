@@ -10,11 +10,12 @@ import json
 import textwrap
 from csv import reader
 from typing import cast, List
+from unittest.mock import patch
 
 import pytz
 
 import shaystack
-from shaystack import dump_scalar, MODE_TRIO, MODE_ZINC, MODE_CSV, Entity
+from shaystack import dump_scalar, jsondumper, MODE_TRIO, MODE_ZINC, MODE_CSV, Entity
 from .test_parser import SIMPLE_EXAMPLE_ZINC, SIMPLE_EXAMPLE_JSON, \
     METADATA_EXAMPLE_JSON, SIMPLE_EXAMPLE_CSV, METADATA_EXAMPLE_CSV, SIMPLE_EXAMPLE_TRIO, \
     SIMPLE_EXAMPLE_HAYSON, METADATA_EXAMPLE_HAYSON
@@ -150,6 +151,51 @@ def test_simple_json():
     assert grid_json == SIMPLE_EXAMPLE_JSON
 
 
+def test_missing_cells_json():
+    grid = shaystack.Grid(version=shaystack.VER_3_0, columns=['id', 'val'])
+    grid.extend([
+        {'id': shaystack.Ref('a'), 'val': 1.0},
+        {'id': shaystack.Ref('b')},
+        {'id': shaystack.Ref('c'), 'val': 'text'},
+    ])
+    grid_json = json.loads(shaystack.dump(grid, mode=shaystack.MODE_JSON))
+    assert grid_json['rows'] == [
+        {'id': 'r:a', 'val': 'n:1.000000'},
+        {'id': 'r:b'},
+        {'id': 'r:c', 'val': 's:text'},
+    ]
+
+
+def test_numeric_columns_json():
+    grid = shaystack.Grid(version=shaystack.VER_3_0, columns=['int', 'float'])
+    grid.extend([
+        {'int': 1, 'float': 1.5},
+        {'int': -2, 'float': float('1e-7')},
+    ])
+    grid_json = json.loads(shaystack.dump(grid, mode=shaystack.MODE_JSON))
+    assert grid_json['rows'] == [
+        {'int': 'n:1.000000', 'float': 'n:1.500000'},
+        {'int': 'n:-2.000000', 'float': 'n:0.000000'},
+    ]
+
+
+def test_sub_str_keys_json():
+    class _SubStr(str):
+        pass
+
+    grid = shaystack.Grid(version=shaystack.VER_3_0, columns={_SubStr('name'): {}})
+    grid.metadata[_SubStr('dis')] = 'Names'
+    grid.append({_SubStr('name'): 'a'})
+    expected = {'meta': {'ver': '3.0', 'dis': 's:Names'},
+                'cols': [{'name': 'name'}],
+                'rows': [{'name': 's:a'}]}
+    # With orjson if it is installed
+    assert json.loads(jsondumper.dump_grid(grid)) == expected
+    # And with the standard json module
+    with patch.object(jsondumper, '_dumps', jsondumper._JSON_ENCODER.encode):  # pylint: disable=protected-access
+        assert json.loads(jsondumper.dump_grid(grid)) == expected
+
+
 def test_simple_hayson():
     grid = make_simple_grid()
     grid_json = json.loads(shaystack.dump(grid, mode=shaystack.MODE_HAYSON))
@@ -885,6 +931,30 @@ def test_scalar_unknown_json():
         pass
 
 
+def test_scalar_subclass_json():
+    class _SubStr(str):
+        pass
+
+    class _SubInt(int):
+        pass
+
+    assert json.loads(shaystack.dump_scalar(_SubStr('abc'), mode=shaystack.MODE_JSON)) == 's:abc'
+    assert json.loads(shaystack.dump_scalar(_SubInt(1), mode=shaystack.MODE_JSON)) == 'n:1.000000'
+    # The shared encoder tables are not modified
+    assert _SubStr not in jsondumper._ENCODERS  # pylint: disable=protected-access
+
+
+def test_scalar_date_time_same_zone_json():
+    berlin = pytz.timezone('Europe/Berlin')
+    for date_time, expected in [
+        (berlin.localize(datetime.datetime(2020, 1, 1)), 't:2020-01-01T00:00:00+01:00 Berlin'),
+        (berlin.localize(datetime.datetime(2020, 7, 1)), 't:2020-07-01T00:00:00+02:00 Berlin'),
+        (datetime.datetime(2020, 1, 1, tzinfo=pytz.utc), 't:2020-01-01T00:00:00+00:00 UTC'),
+        (datetime.datetime(2020, 7, 1, tzinfo=pytz.utc), 't:2020-07-01T00:00:00+00:00 UTC'),
+    ]:
+        assert json.loads(shaystack.dump_scalar(date_time, mode=shaystack.MODE_JSON)) == expected
+
+
 def test_scalar_unknown_hayson():
     try:
         shaystack.dump_scalar(shaystack.VER_2_0,